@@ -8,19 +8,51 @@ Created by A Chaitanya Eshwar Prasad
 import os
 import sqlite3
 from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, jsonify
+from flask.cli import AppGroup
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
+import csv
 import json
+import click
+import gzip
+import hashlib
+import shutil
+import time
+import threading
+import zipfile
+import re
+from collections import namedtuple
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
+
+# Optional dependencies for evidence post-processing
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'iso27001-audit-secret-key-change-in-production'
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['THUMBNAIL_FOLDER'] = 'static/thumbnails'
+app.config['QUARANTINE_FOLDER'] = 'database/quarantine'  # Orphaned uploads moved by the integrity scanner
+app.config['EVIDENCE_WORKERS'] = 2
+app.config['EVIDENCE_MAX_ATTEMPTS'] = 3
+app.config['COLD_STORAGE_DAYS'] = 90  # Compress evidence not downloaded for this many days
+app.config['COLD_STORAGE_INTERVAL'] = 6 * 60 * 60  # Seconds between background migrator runs
+app.config['COLD_STORAGE_RATE'] = 4 * 1024 * 1024  # Max bytes per second read by the migrator
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(app.config['THUMBNAIL_FOLDER'], exist_ok=True)
 os.makedirs('database', exist_ok=True)
 
 # Database configuration
@@ -32,6 +64,13 @@ def get_db_connection():
     conn.row_factory = sqlite3.Row
     return conn
 
+def ensure_columns(conn, table, columns):
+    """Add any missing columns to an existing table"""
+    existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()}
+    for name, definition in columns.items():
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
 def init_database():
     """Initialize database with required tables"""
     conn = get_db_connection()
@@ -78,6 +117,17 @@ def init_database():
         )
     ''')
     
+    # Evidence post-processing columns (added to existing databases as well)
+    ensure_columns(conn, 'evidence', {
+        'sha256': 'TEXT',
+        'extracted_text': 'TEXT',
+        'thumbnail_path': 'TEXT',
+        'processing_status': 'TEXT',
+        'stored_size': 'INTEGER',
+        'compression': 'TEXT',
+        'last_accessed_at': 'TIMESTAMP'
+    })
+    
     # Risk register table
     conn.execute('''
         CREATE TABLE IF NOT EXISTS risks (
@@ -96,6 +146,28 @@ def init_database():
         )
     ''')
     
+    # Daily rollups table (one row per day, kind, category and status)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            category TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, kind, category, status)
+        )
+    ''')
+    
+    # Integrity scanner hash cache (keyed by path, invalidated by mtime/size)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS file_scan_cache (
+            file_path TEXT PRIMARY KEY,
+            mtime REAL NOT NULL,
+            size INTEGER NOT NULL,
+            sha256 TEXT NOT NULL
+        )
+    ''')
+    
     conn.commit()
     
     # Create default admin user if not exists
@@ -111,6 +183,11 @@ def init_database():
     if controls_exist['count'] == 0:
         load_iso27001_controls(conn)
     
+    # Seed today's rollup buckets so trends have a starting point
+    for kind in ROLLUP_SQL:
+        refresh_daily_rollup(conn, kind)
+    conn.commit()
+    
     conn.close()
 
 def load_iso27001_controls(conn):
@@ -226,6 +303,658 @@ def load_iso27001_controls(conn):
     
     conn.commit()
 
+# Control catalog
+# The Annex A catalog never changes after load_iso27001_controls(), so it is
+# read once per process into immutable structures. Views query only the mutable
+# assessment columns and join them onto the catalog in memory.
+CATALOG_FIELDS = ('id', 'control_id', 'title', 'description', 'category')
+CatalogControl = namedtuple('CatalogControl', CATALOG_FIELDS + ('summary', 'truncated'))
+
+ASSESSMENT_FIELDS = ('status', 'notes', 'assessed_by', 'assessed_at', 'updated_at')
+ASSESSMENT_COLUMNS = ', '.join(('control_id',) + ASSESSMENT_FIELDS)
+SUMMARY_LENGTH = 100
+
+class ControlCatalog:
+    """Read-only Annex A catalog with category groupings and a control_id index"""
+    __slots__ = ('controls', 'by_id', 'categories', 'by_category')
+    
+    def __init__(self, rows):
+        controls = tuple(CatalogControl(*row, (row['description'] or '')[:SUMMARY_LENGTH],
+                                        len(row['description'] or '') > SUMMARY_LENGTH) for row in rows)
+        by_category = {}
+        for control in controls:
+            by_category.setdefault(control.category, []).append(control)
+        
+        object.__setattr__(self, 'controls', controls)
+        object.__setattr__(self, 'by_id', MappingProxyType({control.control_id: control for control in controls}))
+        object.__setattr__(self, 'categories', tuple(sorted(by_category)))
+        object.__setattr__(self, 'by_category', MappingProxyType(
+            {category: tuple(members) for category, members in by_category.items()}))
+    
+    def __setattr__(self, name, value):
+        raise AttributeError('ControlCatalog is read-only')
+    
+    def __len__(self):
+        return len(self.controls)
+
+_control_catalog = None
+_control_catalog_lock = threading.Lock()
+
+def get_control_catalog():
+    """Return the process-wide control catalog, loading it on first use"""
+    global _control_catalog
+    if _control_catalog is None:
+        with _control_catalog_lock:
+            if _control_catalog is None:
+                conn = get_db_connection()
+                rows = conn.execute('''
+                    SELECT id, control_id, title, description, category
+                    FROM controls ORDER BY control_id
+                ''').fetchall()
+                conn.close()
+                
+                # Don't cache an empty catalog before the controls are loaded
+                if not rows:
+                    return ControlCatalog(rows)
+                _control_catalog = ControlCatalog(rows)
+    return _control_catalog
+
+class AssessedControl:
+    """A catalog control and its assessment row, read through without copying either"""
+    __slots__ = ('control', 'assessment')
+    
+    def __init__(self, control, assessment):
+        self.control = control
+        self.assessment = assessment
+    
+    def __getitem__(self, key):
+        if key in ASSESSMENT_FIELDS:
+            return self.assessment[key]
+        if key in CatalogControl._fields:
+            return getattr(self.control, key)
+        raise KeyError(key)
+    
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+    
+    def as_dict(self):
+        """Plain dict of the controls table columns, for JSON output"""
+        return dict(zip(CATALOG_FIELDS, self.control), **{field: self.assessment[field] for field in ASSESSMENT_FIELDS})
+
+def get_assessed_controls(conn, category=None):
+    """Return AssessedControl views for the catalog controls, in control_id order"""
+    catalog = get_control_catalog()
+    if category:
+        rows = conn.execute(f'SELECT {ASSESSMENT_COLUMNS} FROM controls WHERE category = ?', (category,))
+        controls = catalog.by_category.get(category, ())
+    else:
+        rows = conn.execute(f'SELECT {ASSESSMENT_COLUMNS} FROM controls')
+        controls = catalog.controls
+    
+    assessments = {row['control_id']: row for row in rows}
+    return [AssessedControl(control, assessments[control.control_id])
+            for control in controls if control.control_id in assessments]
+
+# Daily compliance rollups
+# Controls are bucketed by Annex A category, risks by risk level. Each row holds
+# the end-of-day snapshot count, so days without writes carry the previous value.
+ROLLUP_SQL = {
+    'control': '''
+        SELECT category, status, COUNT(*) as count
+        FROM controls
+        GROUP BY category, status
+    ''',
+    'risk': '''
+        SELECT CASE WHEN risk_score >= 15 THEN 'High'
+                    WHEN risk_score >= 8 THEN 'Medium'
+                    ELSE 'Low' END as category,
+               status, COUNT(*) as count
+        FROM risks
+        GROUP BY category, status
+    '''
+}
+
+ROLLUP_BACKFILL_SQL = {
+    'control': '''
+        SELECT category,
+               CASE WHEN assessed_at IS NOT NULL AND date(assessed_at) <= ? THEN status
+                    ELSE 'Not Assessed' END as day_status,
+               COUNT(*) as count
+        FROM controls
+        GROUP BY category, day_status
+    ''',
+    'risk': '''
+        SELECT CASE WHEN risk_score >= 15 THEN 'High'
+                    WHEN risk_score >= 8 THEN 'Medium'
+                    ELSE 'Low' END as category,
+               status as day_status, COUNT(*) as count
+        FROM risks
+        WHERE date(created_at) <= ?
+        GROUP BY category, day_status
+    '''
+}
+
+def refresh_daily_rollup(conn, kind):
+    """Recompute today's rollup bucket for 'control' or 'risk' (caller commits)"""
+    day = conn.execute("SELECT date('now') as day").fetchone()['day']
+    conn.execute('DELETE FROM daily_rollups WHERE day = ? AND kind = ?', (day, kind))
+    conn.execute('''
+        INSERT INTO daily_rollups (day, kind, category, status, count)
+        SELECT ?, ?, category, status, count FROM (%s)
+    ''' % ROLLUP_SQL[kind], (day, kind))
+
+def backfill_daily_rollups(conn, days=365, overwrite=False):
+    """Fill rollups for the last N days from existing controls and risks.
+
+    History is approximated from timestamps: a control counts with its current
+    status from the day it was assessed, a risk from the day it was created.
+    Only days before the first recorded rollup of each kind are filled, so the
+    accurate history kept by refresh_daily_rollup() survives re-runs; pass
+    overwrite=True to replace the whole window with estimates. Returns the
+    number of (day, kind) buckets written.
+    """
+    today = datetime.strptime(conn.execute("SELECT date('now') as day").fetchone()['day'], '%Y-%m-%d').date()
+    first_recorded = {kind: conn.execute('SELECT MIN(day) as day FROM daily_rollups WHERE kind = ?',
+                                         (kind,)).fetchone()['day'] for kind in ROLLUP_BACKFILL_SQL}
+    filled = 0
+    for offset in range(days - 1, 0, -1):
+        day = (today - timedelta(days=offset)).isoformat()
+        for kind, query in ROLLUP_BACKFILL_SQL.items():
+            if not overwrite and first_recorded[kind] and day >= first_recorded[kind]:
+                continue
+            conn.execute('DELETE FROM daily_rollups WHERE day = ? AND kind = ?', (day, kind))
+            conn.execute('''
+                INSERT INTO daily_rollups (day, kind, category, status, count)
+                SELECT ?, ?, category, day_status, count FROM (%s)
+            ''' % query, (day, kind, day))
+            filled += 1
+    for kind in ROLLUP_SQL:
+        refresh_daily_rollup(conn, kind)
+    conn.commit()
+    return filled
+
+def get_rollup_series(conn, kind, days=365):
+    """Return [(day, {(category, status): count})] for the last N days, gap-filled"""
+    today = datetime.strptime(conn.execute("SELECT date('now') as day").fetchone()['day'], '%Y-%m-%d').date()
+    start = (today - timedelta(days=days - 1)).isoformat()
+    
+    # Seed with the latest snapshot before the window so leading gaps carry over
+    seed_day = conn.execute('''
+        SELECT MAX(day) as day FROM daily_rollups WHERE kind = ? AND day < ?
+    ''', (kind, start)).fetchone()['day']
+    rows = conn.execute('''
+        SELECT day, category, status, count FROM daily_rollups
+        WHERE kind = ? AND day >= ?
+        ORDER BY day
+    ''', (kind, seed_day or start)).fetchall()
+    
+    snapshots = {}
+    for row in rows:
+        snapshots.setdefault(row['day'], {})[(row['category'], row['status'])] = row['count']
+    
+    series = []
+    current = snapshots.get(seed_day, {}) if seed_day else {}
+    for offset in range(days):
+        day = (today - timedelta(days=days - 1 - offset)).isoformat()
+        current = snapshots.get(day, current)
+        series.append((day, current))
+    return series
+
+# Evidence post-processing pipeline
+# Uploads return as soon as the file is stored; hashing, text extraction,
+# thumbnails and scanners run afterwards in a small worker pool. Per-stage
+# status is kept as JSON in evidence.processing_status, e.g.
+# {"hash": {"status": "done", "attempts": 1, "error": null}, ...}
+EVIDENCE_STAGES = ('hash', 'text', 'thumbnail', 'scan')
+EVIDENCE_TEXT_LIMIT = 1024 * 1024  # Characters of extracted text kept per file
+EVIDENCE_SCANNERS = []
+
+_evidence_executor = None
+_evidence_lock = threading.Lock()
+
+def register_evidence_scanner(scanner):
+    """Register a scanner hook: scanner(file_path) returns None when clean or a finding string.
+
+    Files with findings are marked 'flagged' on the scan stage rather than retried.
+    """
+    EVIDENCE_SCANNERS.append(scanner)
+    return scanner
+
+def get_evidence_executor():
+    """Return the shared evidence worker pool, creating it on first use"""
+    global _evidence_executor
+    with _evidence_lock:
+        if _evidence_executor is None:
+            _evidence_executor = ThreadPoolExecutor(max_workers=app.config['EVIDENCE_WORKERS'],
+                                                    thread_name_prefix='evidence')
+        return _evidence_executor
+
+def submit_evidence_processing(evidence_id, delay=0):
+    """Queue an evidence row for post-processing, optionally after a delay"""
+    if delay:
+        timer = threading.Timer(delay, submit_evidence_processing, args=(evidence_id,))
+        timer.daemon = True
+        timer.start()
+    else:
+        get_evidence_executor().submit(process_evidence, evidence_id)
+
+def resume_evidence_processing():
+    """Re-queue evidence left unfinished by a previous run"""
+    conn = get_db_connection()
+    rows = conn.execute('SELECT id, processing_status FROM evidence').fetchall()
+    conn.close()
+    for row in rows:
+        if evidence_pending_stages(row['processing_status']):
+            submit_evidence_processing(row['id'])
+
+def evidence_pending_stages(processing_status):
+    """Return the stages that still need to run for a processing_status value"""
+    stages = json.loads(processing_status) if processing_status else {}
+    return [stage for stage in EVIDENCE_STAGES
+            if stages.get(stage, {}).get('status') not in ('done', 'skipped', 'flagged', 'failed')]
+
+def hash_evidence_file(file_path, compression=None):
+    """Compute the SHA-256 of a file's original content in chunks"""
+    digest = hashlib.sha256()
+    with open_evidence_file(file_path, compression) as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def extract_evidence_text(file_path, filename, compression=None):
+    """Extract searchable text from txt, pdf and docx files (None if unsupported)"""
+    ext = filename.lower().rsplit('.', 1)[-1] if '.' in filename else ''
+    
+    if ext in ('txt', 'csv', 'log'):
+        with open_evidence_file(file_path, compression) as f:
+            return f.read(EVIDENCE_TEXT_LIMIT).decode('utf-8', errors='replace')
+    
+    if ext == 'pdf' and PdfReader is not None:
+        reader = PdfReader(file_path)
+        parts = []
+        for page in reader.pages:
+            parts.append(page.extract_text() or '')
+            if sum(len(p) for p in parts) >= EVIDENCE_TEXT_LIMIT:
+                break
+        return '\n'.join(parts)[:EVIDENCE_TEXT_LIMIT]
+    
+    if ext == 'docx':
+        with zipfile.ZipFile(file_path) as docx:
+            xml = docx.read('word/document.xml').decode('utf-8', errors='replace')
+        xml = re.sub(r'</w:p>', '\n', xml)
+        return re.sub(r'<[^>]+>', '', xml)[:EVIDENCE_TEXT_LIMIT]
+    
+    return None
+
+def create_evidence_thumbnail(file_path, filename):
+    """Create a PNG thumbnail for image evidence (None if unsupported)"""
+    ext = filename.lower().rsplit('.', 1)[-1] if '.' in filename else ''
+    if Image is None or ext not in ('jpg', 'jpeg', 'png', 'gif'):
+        return None
+    
+    thumbnail_path = os.path.join(app.config['THUMBNAIL_FOLDER'], os.path.basename(file_path) + '.png')
+    with Image.open(file_path) as img:
+        img.thumbnail((160, 160))
+        img.save(thumbnail_path, 'PNG')
+    return thumbnail_path
+
+def scan_evidence_file(file_path):
+    """Run registered scanners and return their findings"""
+    findings = []
+    for scanner in EVIDENCE_SCANNERS:
+        finding = scanner(file_path)
+        if finding:
+            findings.append(finding)
+    return findings
+
+def run_evidence_stage(stage, evidence, state):
+    """Run one stage and return (status, evidence columns to update)"""
+    file_path = evidence['file_path']
+    if stage == 'hash':
+        return 'done', {'sha256': hash_evidence_file(file_path, evidence['compression'])}
+    if stage == 'text':
+        text = extract_evidence_text(file_path, evidence['original_filename'], evidence['compression'])
+        return ('done', {'extracted_text': text}) if text is not None else ('skipped', {})
+    if stage == 'thumbnail':
+        thumbnail_path = create_evidence_thumbnail(file_path, evidence['original_filename'])
+        return ('done', {'thumbnail_path': thumbnail_path}) if thumbnail_path else ('skipped', {})
+    if stage == 'scan':
+        if not EVIDENCE_SCANNERS:
+            return 'skipped', {}
+        state['findings'] = scan_evidence_file(file_path)
+        return ('flagged' if state['findings'] else 'done'), {}
+    raise ValueError(f'Unknown evidence stage: {stage}')
+
+def process_evidence(evidence_id):
+    """Run pending post-processing stages for one evidence row"""
+    conn = get_db_connection()
+    try:
+        evidence = conn.execute('SELECT * FROM evidence WHERE id = ?', (evidence_id,)).fetchone()
+        if not evidence:
+            return
+        
+        stages = json.loads(evidence['processing_status']) if evidence['processing_status'] else {}
+        retry = False
+        for stage in evidence_pending_stages(evidence['processing_status']):
+            state = stages.setdefault(stage, {'status': 'pending', 'attempts': 0, 'error': None})
+            state['attempts'] += 1
+            updates = {}
+            try:
+                state['status'], updates = run_evidence_stage(stage, evidence, state)
+                state['error'] = None
+            except Exception as e:
+                state['error'] = str(e)
+                if state['attempts'] >= app.config['EVIDENCE_MAX_ATTEMPTS']:
+                    state['status'] = 'failed'
+                else:
+                    state['status'] = 'retry'
+                    retry = True
+            
+            updates['processing_status'] = json.dumps(stages)
+            conn.execute('UPDATE evidence SET %s WHERE id = ?' % ', '.join(f'{col} = ?' for col in updates),
+                         (*updates.values(), evidence_id))
+            conn.commit()
+        
+        if retry:
+            attempts = max(state['attempts'] for state in stages.values())
+            submit_evidence_processing(evidence_id, delay=2 ** attempts)
+    finally:
+        conn.close()
+
+def evidence_processing_summary(processing_status):
+    """Summarise per-stage status as 'done', 'processing', 'flagged' or 'failed'"""
+    stages = json.loads(processing_status) if processing_status else {}
+    if any(state.get('status') == 'failed' for state in stages.values()):
+        return 'failed'
+    if any(state.get('status') == 'flagged' for state in stages.values()):
+        return 'flagged'
+    if evidence_pending_stages(processing_status):
+        return 'processing'
+    return 'done'
+
+# Evidence cold storage
+# Evidence not downloaded for COLD_STORAGE_DAYS is gzip-compressed in place
+# (file_path gains a .gz suffix). file_size keeps the original size and
+# stored_size the on-disk size; readers go through open_evidence_file().
+# compression is 'gzip', 'identity' (did not shrink) or NULL (not migrated).
+COLD_STORAGE_SKIP_EXTENSIONS = {
+    'gz', 'zip', 'rar', '7z', 'jpg', 'jpeg', 'png', 'gif', 'pdf',
+    'docx', 'xlsx', 'pptx', 'mp4', 'mp3'
+}
+
+def open_evidence_file(file_path, compression=None):
+    """Open evidence for binary reading, decompressing cold-stored files on the fly"""
+    if compression == 'gzip':
+        return gzip.open(file_path, 'rb')
+    return open(file_path, 'rb')
+
+class DecompressedReader:
+    """Cold-stored file wrapper without fileno(), so WSGI servers stream read() instead of sendfile() on the .gz"""
+    __slots__ = ('fileobj',)
+    
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+    
+    def read(self, size=-1):
+        return self.fileobj.read(size)
+    
+    def close(self):
+        self.fileobj.close()
+
+def compress_evidence_file(conn, evidence, rate=None):
+    """Compress one evidence file into cold storage, throttled to `rate` bytes per second
+
+    Returns the stored size, or None if the row was deleted or moved meanwhile.
+    """
+    file_path = evidence['file_path']
+    stored_path = file_path + '.gz'
+    partial_path = stored_path + '.part'
+    
+    with open(file_path, 'rb') as src, gzip.open(partial_path, 'wb') as dst:
+        for chunk in iter(lambda: src.read(64 * 1024), b''):
+            dst.write(chunk)
+            if rate:
+                time.sleep(len(chunk) / rate)
+        original_size = src.tell()
+    os.replace(partial_path, stored_path)
+    stored_size = os.path.getsize(stored_path)
+    
+    # Keep files that do not shrink as they are, and stop reconsidering them
+    if stored_size >= original_size:
+        os.remove(stored_path)
+        cursor = conn.execute('''
+            UPDATE evidence SET compression = 'identity', stored_size = ? WHERE id = ? AND file_path = ?
+        ''', (original_size, evidence['id'], file_path))
+        conn.commit()
+        return original_size if cursor.rowcount else None
+    
+    # Point the row at the compressed copy before removing the original. The
+    # update matches nothing if the evidence was deleted while compressing; the
+    # copy is then discarded and the original left to whoever removed the row.
+    cursor = conn.execute('''
+        UPDATE evidence SET file_path = ?, compression = 'gzip', stored_size = ?
+        WHERE id = ? AND file_path = ?
+    ''', (stored_path, stored_size, evidence['id'], file_path))
+    conn.commit()
+    if not cursor.rowcount:
+        os.remove(stored_path)
+        return None
+    os.remove(file_path)
+    return stored_size
+
+def migrate_cold_evidence(days=None, rate=None):
+    """Compress evidence not accessed in `days` days; returns (files, bytes saved)"""
+    days = app.config['COLD_STORAGE_DAYS'] if days is None else days
+    conn = get_db_connection()
+    candidates = conn.execute('''
+        SELECT * FROM evidence
+        WHERE compression IS NULL
+          AND COALESCE(last_accessed_at, uploaded_at) < datetime('now', ?)
+    ''', (f'-{days} days',)).fetchall()
+    
+    migrated, saved = 0, 0
+    for evidence in candidates:
+        filename = evidence['original_filename']
+        ext = filename.lower().rsplit('.', 1)[-1] if '.' in filename else ''
+        if ext in COLD_STORAGE_SKIP_EXTENSIONS or not os.path.exists(evidence['file_path']):
+            continue
+        try:
+            stored_size = compress_evidence_file(conn, evidence, rate)
+        except OSError as e:
+            app.logger.warning('Cold storage failed for evidence %s: %s', evidence['id'], e)
+            continue
+        if stored_size is not None and stored_size < (evidence['file_size'] or 0):
+            migrated += 1
+            saved += evidence['file_size'] - stored_size
+    
+    conn.close()
+    return migrated, saved
+
+def start_cold_storage_migrator():
+    """Run migrate_cold_evidence() periodically in a daemon thread"""
+    def run():
+        while True:
+            try:
+                migrate_cold_evidence(rate=app.config['COLD_STORAGE_RATE'])
+            except Exception as e:
+                app.logger.warning('Cold storage migration failed: %s', e)
+            time.sleep(app.config['COLD_STORAGE_INTERVAL'])
+    
+    thread = threading.Thread(target=run, name='cold-storage', daemon=True)
+    thread.start()
+    return thread
+
+# Evidence integrity scanner
+# Reconciles static/uploads against the evidence table: files without a row are
+# orphans, rows without a file are missing, and files whose content no longer
+# matches evidence.sha256 are corrupted. Hashes are cached by path, mtime and
+# size in file_scan_cache so repeat scans only re-hash changed files.
+ORPHAN_GRACE_SECONDS = 60 * 60  # Ignore recent files that may not have a row yet
+
+def list_upload_files():
+    """Return {normalised path: os.stat_result} for every file in the uploads tree"""
+    files = {}
+    for root, _, names in os.walk(app.config['UPLOAD_FOLDER']):
+        for name in names:
+            if name == '.gitkeep':
+                continue
+            path = os.path.normpath(os.path.join(root, name))
+            files[path] = os.stat(path)
+    return files
+
+def quarantine_path(file_path):
+    """Return an unused path in the quarantine folder for an orphaned upload"""
+    stem, ext = os.path.splitext(os.path.basename(file_path))
+    filename, counter = stem + ext, 1
+    while os.path.exists(os.path.join(app.config['QUARANTINE_FOLDER'], filename)):
+        filename = f'{stem}_{counter}{ext}'
+        counter += 1
+    return os.path.join(app.config['QUARANTINE_FOLDER'], filename)
+
+def scan_evidence_integrity(repair=False, workers=4):
+    """Scan uploads against evidence rows and return a report dict.
+
+    With repair=True, orphans are moved to QUARANTINE_FOLDER and rows whose
+    file is missing are deleted, each only after re-checking the current row
+    ('quarantined' / 'removed' flags record what was done). Corrupted and
+    unreadable files are only reported.
+    """
+    conn = get_db_connection()
+    rows = conn.execute('SELECT id, control_id, file_path, original_filename, sha256, compression FROM evidence').fetchall()
+    cache = {row['file_path']: row for row in conn.execute('SELECT * FROM file_scan_cache').fetchall()}
+    files = list_upload_files()
+    
+    report = {'scanned_files': len(files), 'evidence_rows': len(rows), 'hashed_files': 0,
+              'orphans': [], 'missing': [], 'corrupted': [], 'unreadable': [], 'repaired': repair}
+    
+    # Reconcile rows against the filesystem
+    known_paths = set()
+    to_verify = []
+    for row in rows:
+        path = os.path.normpath(row['file_path'])
+        known_paths.add(path)
+        if path not in files:
+            report['missing'].append({'id': row['id'], 'control_id': row['control_id'], 'file_path': row['file_path']})
+        elif row['sha256']:
+            to_verify.append((row, path))
+    
+    now = time.time()
+    for path, stat in sorted(files.items()):
+        if path not in known_paths and now - stat.st_mtime > ORPHAN_GRACE_SECONDS:
+            report['orphans'].append({'file_path': path, 'size': stat.st_size})
+    
+    # Hash changed files in parallel, reusing cached digests for unchanged ones.
+    # A file that cannot be read (truncated gzip, permissions, or moved by the
+    # cold-storage migrator since the snapshot) is reported, not fatal.
+    def digest(item):
+        row, path = item
+        stat = files[path]
+        cached = cache.get(path)
+        if cached and cached['mtime'] == stat.st_mtime and cached['size'] == stat.st_size:
+            return row, path, cached['sha256'], False, None
+        try:
+            return row, path, hash_evidence_file(path, row['compression']), True, None
+        except (OSError, EOFError) as e:
+            return row, path, None, False, str(e) or type(e).__name__
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for row, path, sha256, hashed, error in pool.map(digest, to_verify):
+            if error:
+                report['unreadable'].append({'id': row['id'], 'control_id': row['control_id'],
+                                             'file_path': row['file_path'], 'error': error})
+                continue
+            if hashed:
+                report['hashed_files'] += 1
+                conn.execute('''
+                    INSERT OR REPLACE INTO file_scan_cache (file_path, mtime, size, sha256)
+                    VALUES (?, ?, ?, ?)
+                ''', (path, files[path].st_mtime, files[path].st_size, sha256))
+            if sha256 != row['sha256']:
+                report['corrupted'].append({'id': row['id'], 'control_id': row['control_id'], 'file_path': row['file_path'],
+                                            'expected': row['sha256'], 'actual': sha256})
+    
+    # Drop cache entries for files that no longer exist
+    for path in cache:
+        if path not in files:
+            conn.execute('DELETE FROM file_scan_cache WHERE file_path = ?', (path,))
+    
+    conn.commit()
+    
+    # Repairs re-check each item first: the cold-storage migrator or an upload
+    # may have changed a row or file since the snapshot above was taken
+    if repair:
+        os.makedirs(app.config['QUARANTINE_FOLDER'], exist_ok=True)
+        for orphan in report['orphans']:
+            path = orphan['file_path']
+            referenced = conn.execute('SELECT 1 FROM evidence WHERE file_path = ?', (path,)).fetchone()
+            orphan['quarantined'] = not referenced and os.path.exists(path)
+            if orphan['quarantined']:
+                shutil.move(path, quarantine_path(path))
+        for missing in report['missing']:
+            current = conn.execute('SELECT file_path FROM evidence WHERE id = ?', (missing['id'],)).fetchone()
+            missing['removed'] = False
+            if current and not os.path.exists(current['file_path']):
+                # Only delete if file_path is unchanged since the check above
+                cursor = conn.execute('DELETE FROM evidence WHERE id = ? AND file_path = ?',
+                                      (missing['id'], current['file_path']))
+                conn.commit()
+                missing['removed'] = cursor.rowcount > 0
+    
+    conn.close()
+    return report
+
+# Assessment and evidence helpers shared by the web routes and CLI commands
+CONTROL_STATUSES = ('Not Assessed', 'Compliant', 'Not Compliant', 'Not Applicable')
+
+def validate_assessment(status):
+    """Return an error message for an invalid control status, or None"""
+    if status not in CONTROL_STATUSES:
+        return f'Invalid status "{status}"'
+    return None
+
+def save_assessments(conn, assessments):
+    """Apply (status, notes, assessed_by, control_id) tuples in one batch (caller commits)"""
+    conn.executemany('''
+        UPDATE controls 
+        SET status = ?, notes = ?, assessed_by = ?, assessed_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+        WHERE control_id = ?
+    ''', assessments)
+
+def validate_evidence(control_id, original_filename):
+    """Return an error message for an invalid evidence upload, or None"""
+    if not original_filename or not secure_filename(original_filename):
+        return 'No file selected!'
+    if not control_id or control_id not in get_control_catalog().by_id:
+        return 'Invalid file or control selection!'
+    return None
+
+def evidence_storage_path(original_filename):
+    """Return a unique (filename, file_path) in the upload folder for a new evidence file"""
+    base = datetime.now().strftime('%Y%m%d_%H%M%S_') + secure_filename(original_filename)
+    stem, ext = os.path.splitext(base)
+    filename, counter = base, 1
+    while os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], filename)):
+        filename = f'{stem}_{counter}{ext}'
+        counter += 1
+    return filename, os.path.join(app.config['UPLOAD_FOLDER'], filename)
+
+def with_control_title(catalog, evidence):
+    """Return an evidence row as a dict with the catalog title of its control"""
+    control = catalog.by_id.get(evidence['control_id'])
+    return dict(evidence, control_title=control.title if control else None)
+
+def insert_evidence(conn, control_id, filename, original_filename, file_path, uploaded_by):
+    """Insert the row for a stored evidence file and return its id (caller commits)"""
+    cursor = conn.execute('''
+        INSERT INTO evidence (control_id, filename, original_filename, file_path, file_size, uploaded_by)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (control_id, filename, original_filename, file_path,
+          os.path.getsize(file_path), uploaded_by))
+    return cursor.lastrowid
+
 # Authentication helper functions
 def login_required(f):
     """Decorator to require login for routes"""
@@ -329,26 +1058,22 @@ def audit_checklist():
     # Get category filter
     category_filter = request.args.get('category', '')
     
-    # Build query based on filter
-    if category_filter:
-        controls = conn.execute('''
-            SELECT * FROM controls 
-            WHERE category = ? 
-            ORDER BY control_id
-        ''', (category_filter,)).fetchall()
-    else:
-        controls = conn.execute('SELECT * FROM controls ORDER BY control_id').fetchall()
-    
-    # Get all categories for filter dropdown
-    categories = conn.execute('''
-        SELECT DISTINCT category FROM controls ORDER BY category
-    ''').fetchall()
+    # Only list columns are sent with the page; full descriptions are fetched
+    # per control from /api/controls/<control_id> when the details modal opens
+    controls = [{
+        'control_id': control.control_id,
+        'title': control.title,
+        'summary': control.summary,
+        'truncated': control.truncated,
+        'status': control.status,
+        'notes': control.notes
+    } for control in get_assessed_controls(conn, category_filter)]
     
     conn.close()
     
     return render_template('audit_checklist.html', 
                          controls=controls, 
-                         categories=categories,
+                         categories=get_control_catalog().categories,
                          current_category=category_filter)
 
 @app.route('/audit-checklist/update/<control_id>', methods=['POST'])
@@ -358,12 +1083,16 @@ def update_control(control_id):
     status = request.form.get('status')
     notes = request.form.get('notes', '')
     
+    error = validate_assessment(status)
+    if error:
+        if request.headers.get('X-Auto-Save'):
+            return {'success': False, 'message': error}, 400
+        flash(error, 'error')
+        return redirect(url_for('audit_checklist'))
+    
     conn = get_db_connection()
-    conn.execute('''
-        UPDATE controls 
-        SET status = ?, notes = ?, assessed_by = ?, assessed_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
-        WHERE control_id = ?
-    ''', (status, notes, session['username'], control_id))
+    save_assessments(conn, [(status, notes, session['username'], control_id)])
+    refresh_daily_rollup(conn, 'control')
     conn.commit()
     conn.close()
     
@@ -380,20 +1109,27 @@ def evidence():
     """Evidence management page"""
     conn = get_db_connection()
     
-    # Get all evidence with control information
-    evidence_list = conn.execute('''
-        SELECT e.*, c.title as control_title
-        FROM evidence e
-        LEFT JOIN controls c ON e.control_id = c.control_id
-        ORDER BY e.uploaded_at DESC
-    ''').fetchall()
-    
-    # Get all controls for the upload form
-    controls = conn.execute('SELECT control_id, title FROM controls ORDER BY control_id').fetchall()
+    # Search filter (matches file names, controls and extracted text)
+    search = request.args.get('q', '').strip()
+    
+    # Get all evidence; control titles come from the catalog
+    if search:
+        pattern = f'%{search}%'
+        rows = conn.execute('''
+            SELECT * FROM evidence
+            WHERE original_filename LIKE ? OR control_id LIKE ? OR extracted_text LIKE ?
+            ORDER BY uploaded_at DESC
+        ''', (pattern, pattern, pattern)).fetchall()
+    else:
+        rows = conn.execute('SELECT * FROM evidence ORDER BY uploaded_at DESC').fetchall()
     
     conn.close()
     
-    return render_template('evidence.html', evidence_list=evidence_list, controls=controls)
+    catalog = get_control_catalog()
+    evidence_list = [with_control_title(catalog, row) for row in rows]
+    
+    # The upload form lists every control from the catalog
+    return render_template('evidence.html', evidence_list=evidence_list, controls=catalog.controls, search=search)
 
 @app.route('/evidence/upload', methods=['POST'])
 @login_required
@@ -410,30 +1146,25 @@ def upload_evidence():
         flash('No file selected!', 'error')
         return redirect(url_for('evidence'))
     
-    if file and control_id:
-        # Secure filename
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-        filename = timestamp + filename
-        
-        # Save file
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        
-        # Store in database
-        conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO evidence (control_id, filename, original_filename, file_path, file_size, uploaded_by)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (control_id, filename, file.filename, file_path, 
-              os.path.getsize(file_path), session['username']))
-        conn.commit()
-        conn.close()
-        
-        flash(f'Evidence uploaded successfully for control {control_id}!', 'success')
-    else:
-        flash('Invalid file or control selection!', 'error')
+    error = validate_evidence(control_id, file.filename)
+    if error:
+        flash(error, 'error')
+        return redirect(url_for('evidence'))
+    
+    # Save file under a unique, timestamped secure filename
+    filename, file_path = evidence_storage_path(file.filename)
+    file.save(file_path)
     
+    # Store in database
+    conn = get_db_connection()
+    evidence_id = insert_evidence(conn, control_id, filename, file.filename, file_path, session['username'])
+    conn.commit()
+    conn.close()
+    
+    # Hashing, text extraction and thumbnails run in the background
+    submit_evidence_processing(evidence_id)
+    
+    flash(f'Evidence uploaded successfully for control {control_id}!', 'success')
     return redirect(url_for('evidence'))
 
 @app.route('/evidence/download/<int:evidence_id>')
@@ -441,14 +1172,36 @@ def upload_evidence():
 def download_evidence(evidence_id):
     """Download evidence file"""
     conn = get_db_connection()
-    evidence = conn.execute('SELECT * FROM evidence WHERE id = ?', (evidence_id,)).fetchone()
-    conn.close()
     
-    if evidence and os.path.exists(evidence['file_path']):
-        return send_file(evidence['file_path'], 
-                        as_attachment=True, 
-                        download_name=evidence['original_filename'])
+    # The cold-storage migrator may compress the file between reading the row
+    # and opening it, so a missing file gets one retry with the re-read row
+    response = None
+    for attempt in range(2):
+        evidence = conn.execute('SELECT * FROM evidence WHERE id = ?', (evidence_id,)).fetchone()
+        if not evidence:
+            break
+        try:
+            if evidence['compression'] == 'gzip':
+                # Cold-stored files are decompressed while streaming
+                response = send_file(DecompressedReader(open_evidence_file(evidence['file_path'], evidence['compression'])),
+                                     as_attachment=True,
+                                     download_name=evidence['original_filename'])
+                response.content_length = evidence['file_size']
+            else:
+                response = send_file(evidence['file_path'], 
+                                     as_attachment=True, 
+                                     download_name=evidence['original_filename'])
+            break
+        except FileNotFoundError:
+            continue
+    
+    if response is not None:
+        conn.execute('UPDATE evidence SET last_accessed_at = CURRENT_TIMESTAMP WHERE id = ?', (evidence_id,))
+        conn.commit()
+        conn.close()
+        return response
     else:
+        conn.close()
         flash('File not found!', 'error')
         return redirect(url_for('evidence'))
 
@@ -458,14 +1211,19 @@ def risk_register():
     """Risk register page"""
     conn = get_db_connection()
     
+    # Only list columns are sent with the page; full details are fetched from
+    # /api/risks/<risk_id> when a modal opens
     risks = conn.execute('''
-        SELECT * FROM risks 
+        SELECT id, title, substr(description, 1, 100) as summary,
+               length(description) > 100 as truncated,
+               likelihood, impact, risk_score, status, owner
+        FROM risks 
         ORDER BY risk_score DESC, created_at DESC
     ''').fetchall()
     
     conn.close()
     
-    return render_template('risk_register.html', risks=risks)
+    return render_template('risk_register.html', risks=[dict(risk) for risk in risks])
 
 @app.route('/risk-register/add', methods=['POST'])
 @login_required
@@ -483,6 +1241,7 @@ def add_risk():
         INSERT INTO risks (title, description, likelihood, impact, mitigation, owner, created_by)
         VALUES (?, ?, ?, ?, ?, ?, ?)
     ''', (title, description, likelihood, impact, mitigation, owner, session['username']))
+    refresh_daily_rollup(conn, 'risk')
     conn.commit()
     conn.close()
     
@@ -508,6 +1267,7 @@ def update_risk(risk_id):
             mitigation = ?, owner = ?, status = ?, updated_at = CURRENT_TIMESTAMP
         WHERE id = ?
     ''', (title, description, likelihood, impact, mitigation, owner, status, risk_id))
+    refresh_daily_rollup(conn, 'risk')
     conn.commit()
     conn.close()
     
@@ -535,14 +1295,12 @@ def risk_report():
 def evidence_report():
     """Generate evidence management report"""
     conn = get_db_connection()
-    evidence = conn.execute('''
-        SELECT e.*, c.title as control_title 
-        FROM evidence e 
-        LEFT JOIN controls c ON e.control_id = c.control_id 
-        ORDER BY e.uploaded_at DESC
-    ''').fetchall()
+    rows = conn.execute('SELECT * FROM evidence ORDER BY uploaded_at DESC').fetchall()
     conn.close()
     
+    catalog = get_control_catalog()
+    evidence = [with_control_title(catalog, row) for row in rows]
+    
     return render_template('evidence_report.html', evidence=evidence, generated_at=datetime.now(), generated_by=session['username'])
 
 @app.route('/reports/export/html')
@@ -561,7 +1319,7 @@ def export_csv():
     conn = get_db_connection()
     
     # Get all data for the report
-    controls = conn.execute('SELECT * FROM controls ORDER BY control_id').fetchall()
+    controls = get_assessed_controls(conn)
     risks = conn.execute('SELECT * FROM risks ORDER BY risk_score DESC').fetchall()
     
     conn.close()
@@ -624,7 +1382,7 @@ def export_json():
     conn = get_db_connection()
     
     # Get all data for the report
-    controls = conn.execute('SELECT * FROM controls ORDER BY control_id').fetchall()
+    controls = get_assessed_controls(conn)
     risks = conn.execute('SELECT * FROM risks ORDER BY risk_score DESC').fetchall()
     evidence_count = conn.execute('SELECT COUNT(*) as count FROM evidence').fetchone()['count']
     
@@ -641,7 +1399,7 @@ def export_json():
     report_data = {
         'generated_at': datetime.now().isoformat(),
         'generated_by': session['username'],
-        'controls': [dict(control) for control in controls],
+        'controls': [control.as_dict() for control in controls],
         'risks': [dict(risk) for risk in risks],
         'evidence_count': evidence_count,
         'total_controls': total_controls,
@@ -661,7 +1419,7 @@ def generate_report():
     conn = get_db_connection()
     
     # Get all data for the report
-    controls = conn.execute('SELECT * FROM controls ORDER BY control_id').fetchall()
+    controls = get_assessed_controls(conn)
     risks = conn.execute('SELECT * FROM risks ORDER BY risk_score DESC').fetchall()
     evidence_count = conn.execute('SELECT COUNT(*) as count FROM evidence').fetchone()['count']
     
@@ -723,6 +1481,75 @@ def api_dashboard_stats():
         'total_risks': total_risks
     })
 
+@app.route('/api/risks/<int:risk_id>')
+@login_required
+def api_risk_detail(risk_id):
+    """API endpoint for the full details of one risk"""
+    conn = get_db_connection()
+    risk = conn.execute('SELECT * FROM risks WHERE id = ?', (risk_id,)).fetchone()
+    conn.close()
+    
+    if not risk:
+        return jsonify({'success': False, 'message': 'Risk not found'}), 404
+    return jsonify(dict(risk))
+
+@app.route('/api/controls/<control_id>')
+@login_required
+def api_control_detail(control_id):
+    """API endpoint for the full details of one control"""
+    conn = get_db_connection()
+    control = conn.execute('SELECT * FROM controls WHERE control_id = ?', (control_id,)).fetchone()
+    evidence_count = conn.execute('SELECT COUNT(*) as count FROM evidence WHERE control_id = ?',
+                                  (control_id,)).fetchone()['count']
+    conn.close()
+    
+    if not control:
+        return jsonify({'success': False, 'message': 'Control not found'}), 404
+    return jsonify(dict(control, evidence_count=evidence_count))
+
+@app.route('/api/trends/compliance')
+@login_required
+def api_compliance_trend():
+    """API endpoint for daily compliance percentage over the last N days"""
+    days = min(max(request.args.get('days', 365, type=int), 1), 365)
+    conn = get_db_connection()
+    series = get_rollup_series(conn, 'control', days)
+    conn.close()
+    
+    trend = []
+    for day, counts in series:
+        compliant = sum(c for (_, status), c in counts.items() if status == 'Compliant')
+        assessed = sum(c for (_, status), c in counts.items() if status != 'Not Assessed')
+        categories = {}
+        for (category, status), count in counts.items():
+            categories.setdefault(category, {})[status] = count
+        trend.append({
+            'day': day,
+            'compliance_percentage': round((compliant / assessed * 100) if assessed > 0 else 0, 1),
+            'categories': categories
+        })
+    
+    return jsonify({'days': days, 'trend': trend})
+
+@app.route('/api/trends/risks')
+@login_required
+def api_risk_trend():
+    """API endpoint for daily open risk counts by level over the last N days"""
+    days = min(max(request.args.get('days', 365, type=int), 1), 365)
+    conn = get_db_connection()
+    series = get_rollup_series(conn, 'risk', days)
+    conn.close()
+    
+    trend = []
+    for day, counts in series:
+        levels = {'High': 0, 'Medium': 0, 'Low': 0}
+        for (level, status), count in counts.items():
+            if status != 'Closed':
+                levels[level] = levels.get(level, 0) + count
+        trend.append({'day': day, 'open_risks': sum(levels.values()), 'levels': levels})
+    
+    return jsonify({'days': days, 'trend': trend})
+
 @app.route('/evidence/delete/<int:evidence_id>', methods=['DELETE'])
 @login_required
 def delete_evidence(evidence_id):
@@ -731,25 +1558,268 @@ def delete_evidence(evidence_id):
     evidence = conn.execute('SELECT * FROM evidence WHERE id = ?', (evidence_id,)).fetchone()
     
     if evidence:
-        # Delete file from filesystem
-        if os.path.exists(evidence['file_path']):
-            os.remove(evidence['file_path'])
-        
-        # Delete from database
+        # Delete from database first; a crash afterwards leaves an orphan file
+        # for the integrity scanner rather than a row pointing at nothing
         conn.execute('DELETE FROM evidence WHERE id = ?', (evidence_id,))
         conn.commit()
         conn.close()
         
+        # Delete file from filesystem
+        if os.path.exists(evidence['file_path']):
+            os.remove(evidence['file_path'])
+        if evidence['thumbnail_path'] and os.path.exists(evidence['thumbnail_path']):
+            os.remove(evidence['thumbnail_path'])
+        
         return jsonify({'success': True, 'message': 'Evidence deleted successfully'})
     else:
         conn.close()
         return jsonify({'success': False, 'message': 'Evidence not found'}), 404
 
+@app.route('/admin/integrity-scan', methods=['GET', 'POST'])
+@login_required
+def integrity_scan():
+    """Reconcile uploads against evidence rows (POST with repair=1 to fix)"""
+    repair = request.method == 'POST' and request.form.get('repair') == '1'
+    return jsonify(scan_evidence_integrity(repair=repair))
+
+# CLI commands
+@app.cli.command('backfill-rollups')
+@click.option('--days', default=365, show_default=True, help='Number of days to backfill.')
+@click.option('--overwrite', is_flag=True, help='Also replace days that already have recorded rollups.')
+def backfill_rollups_command(days, overwrite):
+    """Backfill daily compliance rollups from existing data"""
+    init_database()
+    conn = get_db_connection()
+    filled = backfill_daily_rollups(conn, days, overwrite)
+    conn.close()
+    click.echo(f'Backfilled {filled} daily rollups over the last {days} days.')
+
+@app.cli.command('process-evidence')
+def process_evidence_command():
+    """Run pending evidence post-processing stages in the foreground"""
+    init_database()
+    conn = get_db_connection()
+    rows = conn.execute('SELECT id, processing_status FROM evidence').fetchall()
+    conn.close()
+    
+    pending = [row['id'] for row in rows if evidence_pending_stages(row['processing_status'])]
+    for evidence_id in pending:
+        process_evidence(evidence_id)
+    click.echo(f'Processed {len(pending)} evidence files.')
+
+@app.cli.command('compress-evidence')
+@click.option('--days', default=None, type=int, help='Compress evidence not accessed for this many days.')
+@click.option('--rate', default=None, type=int, help='Max bytes per second to read (default: unthrottled).')
+def compress_evidence_command(days, rate):
+    """Move cold evidence files into compressed storage"""
+    init_database()
+    migrated, saved = migrate_cold_evidence(days, rate)
+    click.echo(f'Compressed {migrated} evidence files, saved {format_file_size(saved)}.')
+
+@app.cli.command('scan-evidence')
+@click.option('--repair', is_flag=True, help='Quarantine orphans and delete rows whose file is missing.')
+@click.option('--workers', default=4, show_default=True, help='Hashing threads.')
+def scan_evidence_command(repair, workers):
+    """Check evidence files for orphans, missing files and checksum mismatches or unreadable files"""
+    init_database()
+    report = scan_evidence_integrity(repair=repair, workers=workers)
+    click.echo(f"Scanned {report['scanned_files']} files against {report['evidence_rows']} evidence rows "
+               f"({report['hashed_files']} re-hashed).")
+    for key in ('orphans', 'missing', 'corrupted', 'unreadable'):
+        click.echo(f"{key.capitalize()}: {len(report[key])}")
+        for item in report[key]:
+            click.echo(f"  {item['file_path']}" + (f" ({item['error']})" if 'error' in item else ''))
+    if repair:
+        quarantined = sum(1 for item in report['orphans'] if item['quarantined'])
+        removed = sum(1 for item in report['missing'] if item['removed'])
+        click.echo(f'Quarantined {quarantined} orphans and removed {removed} missing rows.')
+
+# Headless batch commands: flask --app app audit <command>
+audit_cli = AppGroup('audit', help='Batch import/export without the web interface.')
+app.cli.add_command(audit_cli)
+
+def read_records(stream, fmt):
+    """Yield (record, error) pairs from a CSV or JSON Lines stream"""
+    if fmt == 'csv':
+        for record in csv.DictReader(stream):
+            yield record, None
+    else:
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield None, f'Invalid JSON ({e.msg})'
+                continue
+            if isinstance(record, dict):
+                yield record, None
+            else:
+                yield None, 'Record is not a JSON object'
+
+def detect_format(stream, fmt):
+    """Pick csv or jsonl from an explicit option or the file extension"""
+    if fmt:
+        return fmt
+    name = getattr(stream, 'name', '')
+    return 'csv' if str(name).lower().endswith('.csv') else 'jsonl'
+
+@audit_cli.command('import-assessments')
+@click.argument('input', type=click.File('r'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Input format (default: from extension, else jsonl).')
+@click.option('--user', default='cli', show_default=True, help='assessed_by for records without one.')
+@click.option('--batch-size', default=5000, show_default=True, help='Records per executemany batch.')
+@click.option('--strict', is_flag=True, help='Abort without changes on the first invalid record.')
+def import_assessments_command(input, fmt, user, batch_size, strict):
+    """Import control assessments (control_id, status, notes, assessed_by) in one transaction"""
+    init_database()
+    fmt = detect_format(input, fmt)
+    conn = get_db_connection()
+    known_controls = get_control_catalog().by_id
+    
+    imported, skipped, batch = 0, 0, []
+    for number, (record, error) in enumerate(read_records(input, fmt), 1):
+        if not error:
+            control_id = str(record.get('control_id') or '').strip()
+            status = str(record.get('status') or '').strip()
+            error = validate_assessment(status)
+            if control_id not in known_controls:
+                error = f'Unknown control "{control_id}"'
+        if error:
+            if strict:
+                conn.rollback()
+                conn.close()
+                raise click.ClickException(f'Record {number}: {error}')
+            click.echo(f'Record {number}: {error}, skipped', err=True)
+            skipped += 1
+            continue
+        
+        batch.append((status, str(record.get('notes') or ''), str(record.get('assessed_by') or user), control_id))
+        if len(batch) >= batch_size:
+            save_assessments(conn, batch)
+            imported += len(batch)
+            batch = []
+    
+    save_assessments(conn, batch)
+    imported += len(batch)
+    refresh_daily_rollup(conn, 'control')
+    conn.commit()
+    conn.close()
+    click.echo(f'Imported {imported} assessments ({skipped} skipped).', err=True)
+
+EXPORT_QUERIES = {
+    'controls': '''
+        SELECT control_id, title, category, status, notes, assessed_by, assessed_at
+        FROM controls ORDER BY control_id
+    ''',
+    'risks': '''
+        SELECT id, title, description, likelihood, impact, risk_score, mitigation, owner, status, created_by, created_at, updated_at
+        FROM risks ORDER BY risk_score DESC
+    ''',
+    'evidence': '''
+        SELECT id, control_id, original_filename, file_path, file_size, sha256, uploaded_by, uploaded_at
+        FROM evidence ORDER BY id
+    '''
+}
+
+@audit_cli.command('export')
+@click.argument('output', type=click.File('w'), default='-')
+@click.option('--what', type=click.Choice(sorted(EXPORT_QUERIES)), default='controls', show_default=True)
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Output format (default: from extension, else jsonl).')
+def export_command(output, what, fmt):
+    """Stream controls, risks or evidence metadata as CSV or JSON Lines"""
+    init_database()
+    fmt = detect_format(output, fmt)
+    conn = get_db_connection()
+    cursor = conn.execute(EXPORT_QUERIES[what])
+    columns = [column[0] for column in cursor.description]
+    
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(output)
+        writer.writerow(columns)
+        for row in cursor:
+            writer.writerow(['' if value is None else value for value in row])
+            count += 1
+    else:
+        for row in cursor:
+            output.write(json.dumps(dict(zip(columns, row))) + '\n')
+            count += 1
+    
+    conn.close()
+    click.echo(f'Exported {count} {what} records.', err=True)
+
+@audit_cli.command('attach-evidence')
+@click.argument('manifest', type=click.File('r'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Manifest format (default: from extension, else jsonl).')
+@click.option('--user', default='cli', show_default=True, help='uploaded_by for the new evidence.')
+@click.option('--process', is_flag=True, help='Run hashing/text extraction inline instead of on next server start.')
+def attach_evidence_command(manifest, fmt, user, process):
+    """Attach files listed in a manifest (control_id, path) as evidence"""
+    init_database()
+    fmt = detect_format(manifest, fmt)
+    conn = get_db_connection()
+    
+    attached = []
+    skipped = 0
+    for number, (record, error) in enumerate(read_records(manifest, fmt), 1):
+        if not error:
+            control_id = str(record.get('control_id') or '').strip()
+            source = str(record.get('path') or '')
+            original_filename = str(record.get('original_filename') or os.path.basename(source))
+            error = validate_evidence(control_id, original_filename)
+            if not error and not os.path.isfile(source):
+                error = f'File not found: {source}'
+        if error:
+            click.echo(f'Record {number}: {error}, skipped', err=True)
+            skipped += 1
+            continue
+        
+        filename, file_path = evidence_storage_path(original_filename)
+        shutil.copyfile(source, file_path)
+        attached.append(insert_evidence(conn, control_id, filename, original_filename, file_path, user))
+    
+    conn.commit()
+    conn.close()
+    
+    if process:
+        for evidence_id in attached:
+            process_evidence(evidence_id)
+    click.echo(f'Attached {len(attached)} evidence files ({skipped} skipped).', err=True)
+
+@audit_cli.command('recompute-stats')
+@click.option('--backfill', default=0, help='Also backfill daily rollups for this many past days.')
+@click.option('--overwrite', is_flag=True, help='With --backfill, also replace days that already have recorded rollups.')
+def recompute_stats_command(backfill, overwrite):
+    """Refresh today's rollups and print compliance statistics"""
+    init_database()
+    conn = get_db_connection()
+    if backfill:
+        backfill_daily_rollups(conn, backfill, overwrite)
+    for kind in ROLLUP_SQL:
+        refresh_daily_rollup(conn, kind)
+    conn.commit()
+    
+    counts = {row['status']: row['count'] for row in conn.execute('''
+        SELECT status, COUNT(*) as count FROM controls GROUP BY status
+    ''')}
+    open_risks = conn.execute("SELECT COUNT(*) as count FROM risks WHERE status != 'Closed'").fetchone()['count']
+    conn.close()
+    
+    assessed = sum(counts.values()) - counts.get('Not Assessed', 0)
+    compliance = round((counts.get('Compliant', 0) / assessed * 100) if assessed > 0 else 0, 1)
+    for status in CONTROL_STATUSES:
+        click.echo(f'{status}: {counts.get(status, 0)}')
+    click.echo(f'Compliance: {compliance}%')
+    click.echo(f'Open risks: {open_risks}')
+
 # Template helper functions
 @app.template_filter('format_file_size')
-def format_file_size(size_bytes):
-    """Format file size in human readable format"""
-    if size_bytes == 0:
+def format_file_size(size_bytes, stored_size=None):
+    """Format file size in human readable format, with the stored size when compressed"""
+    if stored_size is not None and stored_size != size_bytes:
+        return f"{format_file_size(size_bytes)} (stored {format_file_size(stored_size)})"
+    if not size_bytes:
         return "0 B"
     size_names = ["B", "KB", "MB", "GB"]
     import math
@@ -786,6 +1856,11 @@ def get_file_icon(filename):
     
     return icon_map.get(ext, 'bi-file')
 
+@app.template_filter('processing_summary')
+def processing_summary(processing_status):
+    """Template filter for the overall evidence post-processing state"""
+    return evidence_processing_summary(processing_status)
+
 @app.template_global()
 def moment():
     """Template global for current datetime"""
@@ -804,6 +1879,10 @@ def internal_error(error):
 
 if __name__ == '__main__':
     init_database()
+    # Only the reloader child serves requests, so resume the pipeline there
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        resume_evidence_processing()
+        start_cold_storage_migrator()
     print("ACEP ISO 27001 Audit Tool starting...")
     print("Created by A Chaitanya Eshwar Prasad")
     print("Access the application at: http://localhost:5000")
@@ -91,25 +91,14 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    // Control status change handling
-    document.querySelectorAll('.control-status').forEach(select => {
-        select.addEventListener('change', function() {
-            const controlRow = this.closest('tr');
+    // Control status change handling (delegated so virtualized rows are covered)
+    document.addEventListener('change', function(event) {
+        if (event.target.matches('.control-status')) {
+            const controlRow = event.target.closest('tr');
             if (controlRow) {
-                updateControlRowStyle(controlRow, this.value);
+                updateControlRowStyle(controlRow, event.target.value);
             }
-        });
-    });
-    
-    // Enhanced table interactions
-    document.querySelectorAll('.table tbody tr').forEach(row => {
-        row.addEventListener('mouseenter', function() {
-            this.style.transform = 'scale(1.01)';
-        });
-        
-        row.addEventListener('mouseleave', function() {
-            this.style.transform = 'scale(1)';
-        });
+        }
     });
     
     // Performance optimization: Lazy load images
@@ -132,6 +121,82 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 // Utility functions
+function escapeHtml(value) {
+    const entities = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+    return String(value ?? '').replace(/[&<>"']/g, ch => entities[ch]);
+}
+
+/**
+ * Virtualized table body: only rows in (or near) the scroll viewport are in
+ * the DOM. Spacer rows above and below keep the scrollbar size correct.
+ * renderRow(record) must return the HTML of one <tr>.
+ */
+class VirtualTable {
+    constructor(container, tbody, rows, renderRow, options = {}) {
+        this.container = container;
+        this.tbody = tbody;
+        this.rows = rows;
+        this.visibleRows = rows;
+        this.renderRow = renderRow;
+        this.columns = options.columns || 1;
+        this.rowHeight = options.rowHeight || 60;
+        this.overscan = options.overscan || 8;
+        this.range = null;
+        this.frame = null;
+        this.measured = false;
+        
+        this.container.addEventListener('scroll', () => this.scheduleRender(), { passive: true });
+        window.addEventListener('resize', () => this.scheduleRender());
+        this.render(true);
+    }
+    
+    filter(predicate) {
+        this.visibleRows = predicate ? this.rows.filter(predicate) : this.rows;
+        this.container.scrollTop = 0;
+        this.render(true);
+        return this.visibleRows.length;
+    }
+    
+    scheduleRender() {
+        if (this.frame) return;
+        this.frame = requestAnimationFrame(() => {
+            this.frame = null;
+            this.render(false);
+        });
+    }
+    
+    render(force) {
+        const total = this.visibleRows.length;
+        const viewportHeight = this.container.clientHeight || window.innerHeight;
+        const first = Math.floor(this.container.scrollTop / this.rowHeight);
+        const start = Math.max(0, first - this.overscan);
+        const end = Math.min(total, first + Math.ceil(viewportHeight / this.rowHeight) + this.overscan);
+        
+        if (!force && this.range && this.range[0] === start && this.range[1] === end) return;
+        this.range = [start, end];
+        
+        const spacer = height => height > 0
+            ? `<tr class="virtual-spacer" style="height: ${height}px;"><td colspan="${this.columns}"></td></tr>`
+            : '';
+        this.tbody.innerHTML = spacer(start * this.rowHeight)
+            + this.visibleRows.slice(start, end).map(this.renderRow).join('')
+            + spacer((total - end) * this.rowHeight);
+        
+        // Replace the initial row height guess with the rendered average once
+        if (!this.measured) {
+            const rendered = this.tbody.querySelectorAll('tr:not(.virtual-spacer)');
+            if (rendered.length) {
+                const height = Array.from(rendered).reduce((sum, row) => sum + row.offsetHeight, 0) / rendered.length;
+                if (height > 0) {
+                    this.measured = true;
+                    this.rowHeight = height;
+                    this.render(true);
+                }
+            }
+        }
+    }
+}
+
 function getRiskClass(score) {
     if (score <= 4) return 'risk-low';
     if (score <= 9) return 'risk-medium';
@@ -144,16 +209,16 @@ function updateControlRowStyle(row, status) {
     
     // Add appropriate status class
     switch(status) {
-        case 'compliant':
+        case 'Compliant':
             row.classList.add('table-success');
             break;
-        case 'non-compliant':
+        case 'Not Compliant':
             row.classList.add('table-danger');
             break;
-        case 'not-applicable':
+        case 'Not Applicable':
             row.classList.add('table-info');
             break;
-        case 'not-assessed':
+        case 'Not Assessed':
             row.classList.add('table-warning');
             break;
     }